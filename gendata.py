@@ -1,9 +1,13 @@
 import pandas as pd
 import numpy as np
 import argparse
-from aaindex import *
-from helpers import *
-from paths import *
+from aaindex import (feature_vector, hydrophobicity, steric_parameter, residue_volume, polarizability,
+                     average_relative_probability_of_helix, average_relative_probability_of_beta_sheet,
+                     isoelectric_point)
+from helpers import (extract_sequence, label_residues, safe_hse_and_dssp, one_hot_encode_row, extend_hse,
+                     get_pssm_profile, make_tabular_dataset, process_images)
+from paths import DEFAULTS, load_paths, add_path_arguments
+from manifest import load_or_scan, complete_complexes, COMPLEX_FILES
 import os
 import pickle
 
@@ -12,15 +16,24 @@ if __name__ == "__main__":
     parser.add_argument("--images", type=bool, default=False, help="Set to True to generate images. Default is False.")
     parser.add_argument("--binding_path", type=str, help="Path to save binding images.")
     parser.add_argument("--nonbinding_path", type=str, help="Path to save non-binding images.")
+    parser.add_argument("--normalization", type=str, default='minmax', choices=['minmax', 'zscore'], help="Per-feature scaling applied to images. Default is minmax.")
+    parser.add_argument("--rescan", action='store_true', help="Rescan PepBDB and refresh the manifest before running.")
+    parser.add_argument("--image_workers", type=int, default=None, help="Number of threads writing images. Defaults to min(32, CPU count + 4).")
+    add_path_arguments(parser)
     args = parser.parse_args()
 
+    # Resolve paths from CLI options, environment variables and config file
+    paths = load_paths(args.config, {key: getattr(args, key) for key in DEFAULTS})
+    pepbdb = paths['pepbdb']
+    peppi_data_csv = paths['peppi_data_csv']
+
     # Validate that paths are provided if images is True
     if args.images:
         if not args.binding_path or not args.nonbinding_path:
             parser.error("--binding_path and --nonbinding_path are required when --images is set to True.")
 
     ## Load data and add headers
-    peptide_list = pd.read_csv(peptide_list_txt, sep='\s+', header=None)
+    peptide_list = pd.read_csv(paths['peptide_list_txt'], sep='\s+', header=None)
 
     headers = ['PDB ID', 'Peptide Chain ID', 'Peptide Length', 'Number of Atoms in Peptide',
                'Protein Chain ID', 'Number of Atoms in Protein',
@@ -28,32 +41,22 @@ if __name__ == "__main__":
 
     peptide_list.columns = headers
 
-    peptide_list['Peptide Path'] = pepbdb + peptide_list['PDB ID'] + '_' + peptide_list['Peptide Chain ID'] + '/peptide.pdb'
-    peptide_list['Protein Path'] = pepbdb + peptide_list['PDB ID'] + '_' + peptide_list['Peptide Chain ID'] + '/receptor.pdb'
-
-    peptide_list.reset_index(drop=True)
-    print(peptide_list.shape)
-
-    #####################################################
-    ## The following section is for local testing only ##
-    #####################################################
-
-    # Get the list of all directories in the given directory
-    def get_dirs(directory):
-        dirs = [d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d))]
-        dirs = [d[:4] for d in dirs]
-        return set(dirs)
+    ## Locate PDB files through the manifest rather than walking PepBDB
+    manifest = load_or_scan(pepbdb, paths['manifest_csv'], rescan=args.rescan)
+    complexes = complete_complexes(manifest)
 
-    dirs = get_dirs(pepbdb)
+    peptide_list['Complex'] = peptide_list['PDB ID'] + '_' + peptide_list['Peptide Chain ID']
 
-    # Filter peptide_list to keep only rows where the PDB ID is in the list of first 4 characters
-    peptide_list = peptide_list[peptide_list['PDB ID'].isin(dirs)]
+    # Keep only complexes whose peptide and receptor files are present and non-empty
+    peptide_list = peptide_list[peptide_list['Complex'].isin(complexes)].copy()
+    peptide_list['Peptide Path'] = peptide_list['Complex'].map(lambda c: complexes[c][COMPLEX_FILES[0]])
+    peptide_list['Protein Path'] = peptide_list['Complex'].map(lambda c: complexes[c][COMPLEX_FILES[1]])
+    peptide_list = peptide_list.drop(columns='Complex')
 
-    print('\033[1mFiltering based on directory names done.\033[0m')
+    peptide_list.reset_index(drop=True)
+    print(peptide_list.shape)
 
-    #####################################################
-    ## Local based filtering step is completed.        ##
-    #####################################################
+    print('\033[1mFiltering based on the manifest done.\033[0m')
 
     print('Initial filtering...')
 
@@ -138,8 +141,8 @@ if __name__ == "__main__":
     print('Now generating and filtering PSSMs...')
 
     ## Add PSSM profiles into dataframe
-    peptide_list['Peptide PSSM'] = peptide_list['Peptide Sequence'].apply(get_pssm_profile)
-    peptide_list['Protein PSSM'] = peptide_list['Protein Sequence'].apply(get_pssm_profile)
+    peptide_list['Peptide PSSM'] = peptide_list['Peptide Sequence'].apply(lambda x: get_pssm_profile(x, paths['swissprot']))
+    peptide_list['Protein PSSM'] = peptide_list['Protein Sequence'].apply(lambda x: get_pssm_profile(x, paths['swissprot']))
 
     print('\033[1mPSSMs generated.\033[0m')
 
@@ -178,13 +181,14 @@ if __name__ == "__main__":
         print(f'\r{i+1}/{peptide_list.shape[0]}', end='')
     
     # Save the list to a .pkl file
-    with open('/home/mhilali/projects/def-bingalls/mhilali/list_of_feature_arrays.pkl', 'wb') as file:
+    with open(paths['feature_arrays_pkl'], 'wb') as file:
         pickle.dump(list_of_feature_arrays, file)
     
     ## Optional step to create images:
     if args.images:
         print('\033[1m\nNow creating images...\033[0m')
-        process_images(list_of_feature_arrays, binding_path=args.binding_path, nonbinding_path=args.nonbinding_path)
+        process_images(list_of_feature_arrays, binding_path=args.binding_path, nonbinding_path=args.nonbinding_path,
+                       normalization=args.normalization, workers=args.image_workers)
 
     print('\033[1m\nConverted.\033[0m')
 
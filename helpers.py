@@ -1,24 +1,30 @@
 '''
     A series of hellper functions designed to create an enriched version
     of the PepBDB database, ideal for machine learning and CNNs.
+
+    Heavy dependencies (NumPy, pandas, Biopython, PIL) are imported inside the functions
+    that use them, so importing this module stays cheap for stages that don't.
 '''
-import numpy as np
+from __future__ import annotations
 import os
-from Bio.PDB import PDBParser, HSExposure, DSSP
-from Bio.SeqUtils import seq1
 import subprocess
-import pandas as pd
 from ast import literal_eval
 import tempfile
-from paths import *
-from typing import List
+from typing import List, TYPE_CHECKING
 import warnings
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
 def extract_sequence(pdb_filename: str) -> str:
     '''
     Helper function that extracts the sequence from a PDB file.
     '''
+    from Bio.PDB import PDBParser
+    from Bio.SeqUtils import seq1
+
     parser = PDBParser()
     structure = parser.get_structure('X', pdb_filename)
     
@@ -39,6 +45,8 @@ def extract_sequence(pdb_filename: str) -> str:
     return sequence
 
 def label_residues(peptide_path: str, protein_path: str) -> List:
+    import pandas as pd
+
     # Creating a temporary file with the peptide and protein
     with tempfile.NamedTemporaryFile(suffix='.pdb', delete=False) as temp_file:
         output_path = temp_file.name
@@ -76,6 +84,8 @@ def hse_and_dssp(pdb_file: str):
     '''
     Get the HSE and DSSP codes of a PDB's residues.
     '''
+    from Bio.PDB import PDBParser, HSExposure, DSSP
+
     with warnings.catch_warnings():
         warnings.simplefilter(action='ignore', category=FutureWarning)
         
@@ -122,6 +132,8 @@ def one_hot_encode_array(ss_array):
     return encoding
 
 def one_hot_encode_row(row):
+    import pandas as pd
+
     pep_encoded = one_hot_encode_array(row['Peptide SS'])
     prot_encoded = one_hot_encode_array(row['Protein SS'])
     new_data = {}
@@ -139,11 +151,13 @@ def extend_hse(hse: str) -> str:
     
     return hse
 
-def get_pssm_profile(sequence: str) -> pd.DataFrame:
+def get_pssm_profile(sequence: str, db: str) -> pd.DataFrame:
     '''
     Uses blast+ psiblast to generate PSSM profile from a 
-    temporary fasta file.
+    temporary fasta file, searching the `db` database (e.g. swissprot).
     '''
+    import pandas as pd
+
     with tempfile.NamedTemporaryFile(suffix='.fa', delete=False) as fasta_file:
         fasta_file.write(f'>tmp\n{sequence}'.encode('utf-8'))
         fasta_path = fasta_file.name
@@ -153,7 +167,7 @@ def get_pssm_profile(sequence: str) -> pd.DataFrame:
 
     try:
         subprocess.run(
-            ['psiblast', '-query', fasta_path, '-db', swissprot, '-num_iterations', '3', '-evalue', '0.001', '-out_ascii_pssm', pssm_path],
+            ['psiblast', '-query', fasta_path, '-db', db, '-num_iterations', '3', '-evalue', '0.001', '-out_ascii_pssm', pssm_path],
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
             check=True
@@ -183,6 +197,8 @@ def make_tabular_dataset(row: pd.Series) -> pd.DataFrame:
     `make_tabular_dataset` is designed to be applied to a row of the input DataFrame
     to create a feature array.
     '''
+    import pandas as pd
+
     feature_dict = row.to_dict()
     
     # get sequence and PSSM
@@ -241,93 +257,175 @@ def make_tabular_dataset(row: pd.Series) -> pd.DataFrame:
 
     return pd.DataFrame(arr)
 
-def window_maker(sequence_array: pd.DataFrame) -> List[pd.DataFrame]:
+def window_indices(sequence_length: int) -> List[List[int]]:
     '''
-    Takes a sequence array and returns a list windowed arrays by sliding a window over the input feature array. 
-    The window is centered on the residue of interest. 
+    Returns the residue positions of each window produced by `window_maker`.
+    Windows are centered on the residue of interest and mirrored at the termini.
     '''
-    
-    k = 7 # window size
+    positions = list(range(sequence_length))
     windows = []
-    sequence_array = sequence_array.T.reset_index(drop=True)
-    sequence_length = sequence_array.shape[1]
-    
-    
+
     for i in range(sequence_length):
-        
+
         # N-terminal case
         if i < 3:
-            
-            right = sequence_array.iloc[:, 0:i+4]
-            
+
+            right = positions[0:i+4]
+
             if i == 0:
-                left = right.iloc[:, :-4:-1]
+                left = right[:-4:-1]
             elif i == 1:
-                left = right.iloc[:, 1::-1]
+                left = right[1::-1]
             elif i == 2:
-                left = right.iloc[:, 1]
-            
-            window = pd.concat([left, right], axis = 1)
-        
+                left = [right[1]]
+
+            window = left + right
+
         # C-terminal case
         elif i >= sequence_length - 3:
-            
-            left = sequence_array.iloc[:, i-3:]
-            
+
+            left = positions[i-3:]
+
             if i == sequence_length - 3:
-                right = sequence_array.iloc[:, i+1]
+                right = [positions[i+1]]
             elif i == sequence_length - 2:
-                right = sequence_array.iloc[:, i-2:i].iloc[:, ::-1]
+                right = positions[i-2:i][::-1]
             elif i == sequence_length - 1:
-                right = sequence_array.iloc[:, i-3:i].iloc[:, ::-1]
-            
-            window = pd.concat([left, right], axis = 1)
-        
+                right = positions[i-3:i][::-1]
+
+            window = left + right
+
         # Standard case
         else:
-            window = sequence_array.iloc[:, i-3:i+4]
-        
+            window = positions[i-3:i+4]
+
         windows.append(window)
     return windows
 
-def create_images(window: pd.DataFrame, name: str):
+def window_maker(sequence_array: pd.DataFrame) -> List[pd.DataFrame]:
     '''
-    Helper function that accepts a window DataFrame and converts it 
-    into a CNN-friendly image.
+    Takes a sequence array and returns a list windowed arrays by sliding a window over the input feature array. 
+    The window is centered on the residue of interest. 
     '''
-    window = window.T.reset_index(drop=True) # transpose the array and reset the index
-    window = window.apply(pd.to_numeric, errors='coerce') # convert to numeric
-    window = window.to_numpy() # convert to numpy array
-    window_normalized = window * 255 # scale to 0-255
-        
-    window_uint8 = window_normalized.astype('uint8')
-    img = Image.fromarray(window_uint8)
-    img.save(name)
-    print(f'\rCreated image: {name}.', end='')
-    
-def process_images(list_of_feature_arrays: List[pd.DataFrame], binding_path: str, nonbinding_path: str):
+    sequence_array = sequence_array.T.reset_index(drop=True)
+    sequence_length = sequence_array.shape[1]
+
+    return [sequence_array.iloc[:, window] for window in window_indices(sequence_length)]
+
+def feature_matrix(list_of_feature_arrays: List[pd.DataFrame]) -> np.ndarray:
+    '''
+    Stacks the numeric features of every residue into one (residues, features) array.
+    Non-numeric values become NaN.
+    '''
+    import numpy as np
+    import pandas as pd
+
+    matrices = []
+    for arr in list_of_feature_arrays:
+        features = arr.drop(columns=['AA', 'Binding Indices'])
+        matrices.append(features.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64))
+    return np.concatenate(matrices)
+
+def feature_statistics(features: np.ndarray) -> dict:
+    '''
+    Per-feature min, max, mean and standard deviation over a (residues, features) array,
+    ignoring NaNs. Computed once over the dataset and reused for every window.
+    '''
+    import numpy as np
+
+    with warnings.catch_warnings():
+        warnings.simplefilter(action='ignore', category=RuntimeWarning) # all-NaN features
+        return {
+            'min': np.nanmin(features, axis=0),
+            'max': np.nanmax(features, axis=0),
+            'mean': np.nanmean(features, axis=0),
+            'std': np.nanstd(features, axis=0),
+        }
+
+def normalize_features(features: np.ndarray, stats: dict, method: str = 'minmax', z_clip: float = 3.0) -> np.ndarray:
+    '''
+    Scales features to 0-255 and clips them to uint8.
+
+    - `minmax` maps each feature's [min, max] onto [0, 255].
+    - `zscore` maps each feature's [-z_clip, z_clip] standard deviations onto [0, 255].
+
+    NaNs are mapped to 0; callers should mask them beforehand.
+    '''
+    import numpy as np
+
+    if method == 'minmax':
+        offset = stats['min']
+        scale = stats['max'] - stats['min']
+    elif method == 'zscore':
+        offset = stats['mean'] - z_clip * stats['std']
+        scale = 2 * z_clip * stats['std']
+    else:
+        raise ValueError(f"Unknown normalization method '{method}'. Use 'minmax' or 'zscore'.")
+
+    scale = np.where(scale > 0, scale, 1.0) # constant features map to 0
+    scaled = (features - offset) / scale * 255
+    scaled = np.nan_to_num(scaled, nan=0.0)
+    return np.clip(np.rint(scaled), 0, 255).astype(np.uint8)
+
+def create_images(window: np.ndarray, name: str):
     '''
-    Takes a list sequence feature arrays and uses create_images to turn valid ones into images
+    Helper function that saves a normalized (residues, features) uint8 window
+    as a lossless PNG image.
+    '''
+    from PIL import Image
+
+    Image.fromarray(window).save(name, format='PNG')
+    return name
+
+def process_images(list_of_feature_arrays: List[pd.DataFrame], binding_path: str, nonbinding_path: str,
+                   normalization: str = 'minmax', stats: dict = None, workers: int = None) -> dict:
+    '''
+    Takes a list sequence feature arrays and turns valid windows into images
     in the appropriate folder.
+
+    Per-feature statistics are computed once over the whole dataset (unless `stats`
+    is given, e.g. from a training set), every residue is normalized in a single
+    NumPy operation, and the images are written concurrently by `workers` threads.
+    Windows containing any NaN are skipped. Returns the statistics used.
     '''
+    import numpy as np
+
     os.makedirs(binding_path, exist_ok=True)
     os.makedirs(nonbinding_path, exist_ok=True)
+
+    features = feature_matrix(list_of_feature_arrays)
+    missing = np.isnan(features).any(axis=1)
+    if stats is None:
+        stats = feature_statistics(features)
+    pixels = normalize_features(features, stats, method=normalization)
+
+    # Collect valid windows as residue positions into `pixels`
+    windows = []
+    names = []
+    offset = 0
     name_index = 0
-    
     for arr in list_of_feature_arrays:
-        residues = arr.pop('AA')
-        
-        binding_indices = arr.pop('Binding Indices')
-        binding_indices = binding_indices.to_list()
-        
-        windows = window_maker(arr)
-        for i, window in enumerate(windows):
-            if not window.isna().any().any():
+        binding_indices = arr['Binding Indices'].to_list()
+
+        for i, window in enumerate(window_indices(len(arr))):
+            window = np.asarray(window) + offset
+            if not missing[window].any():
                 name_index += 1
                 folder = binding_path if binding_indices[i] == 1 else nonbinding_path
-                name = f'{folder}/{name_index}.jpg'
-                create_images(window, name)
-            else:
-                continue
+                windows.append(window)
+                names.append(f'{folder}/{name_index}.png')
+        offset += len(arr)
+
+    # Images are tiny, so the work is mostly file writes; the thread pool overlaps them.
+    # Windows are submitted in chunks to bound the number of pending images.
+    chunk_size = 10000
+    count = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(windows), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            for name in executor.map(create_images, (pixels[window] for window in windows[chunk]), names[chunk]):
+                count += 1
+                print(f'\rCreated image {count}/{len(names)}: {name}.', end='')
     print('\n')
-        
\ No newline at end of file
+
+    return stats
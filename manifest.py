@@ -0,0 +1,155 @@
+'''
+    Builds and reads a manifest of the PepBDB directory tree.
+
+    The manifest is a CSV with one row per PDB file (absolute path, size, mtime and
+    SHA-256 content hash), grouped by complex directory (e.g. `1abc_B`). Its first
+    line records the absolute PepBDB root it was scanned from. Later stages read
+    file locations from it instead of walking PepBDB again, and rescans only rehash
+    files whose size or mtime changed.
+'''
+import os
+import csv
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from paths import DEFAULTS, load_paths, add_path_arguments
+
+MANIFEST_COLUMNS = ['complex', 'file', 'path', 'size', 'mtime', 'sha256']
+
+# First line of the manifest, followed by the absolute PepBDB root
+ROOT_PREFIX = '# pepbdb: '
+
+# Files each complex directory is expected to contain
+COMPLEX_FILES = ['peptide.pdb', 'receptor.pdb']
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    '''
+    Returns the SHA-256 hex digest of a file's contents.
+    '''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_complex(complex_dir: str, previous: Dict[str, dict] = None) -> List[dict]:
+    '''
+    Stats and hashes the PDB files in one complex directory. Hashes from `previous`
+    (keyed by path) are reused when size and mtime are unchanged.
+    '''
+    previous = previous or {}
+    complex_name = os.path.basename(os.path.normpath(complex_dir))
+    entries = []
+
+    with os.scandir(complex_dir) as it:
+        for entry in it:
+            if not entry.is_file() or not entry.name.endswith('.pdb'):
+                continue
+            stat = entry.stat()
+            old = previous.get(entry.path)
+            if old and int(old['size']) == stat.st_size and int(old['mtime']) == stat.st_mtime_ns:
+                sha256 = old['sha256']
+            else:
+                sha256 = file_hash(entry.path)
+            entries.append({
+                'complex': complex_name,
+                'file': entry.name,
+                'path': entry.path,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'sha256': sha256,
+            })
+    return entries
+
+def scan_pepbdb(pepbdb: str, previous: List[dict] = None, workers: int = None) -> List[dict]:
+    '''
+    Walks the PepBDB tree once with `os.scandir` and scans the complex directories
+    in parallel. Returns manifest rows with absolute paths, sorted by complex and file name.
+    '''
+    pepbdb = os.path.abspath(pepbdb)
+    with os.scandir(pepbdb) as it:
+        complex_dirs = [entry.path for entry in it if entry.is_dir()]
+
+    previous = {row['path']: row for row in previous or []}
+
+    # stat and read calls block on I/O (especially over NFS), so threads overlap them
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as executor:
+        results = executor.map(lambda d: scan_complex(d, previous), complex_dirs)
+        entries = [entry for complex_entries in results for entry in complex_entries]
+
+    entries.sort(key=lambda entry: (entry['complex'], entry['file']))
+    return entries
+
+def write_manifest(entries: List[dict], manifest_csv: str, pepbdb: str):
+    '''
+    Writes manifest rows scanned from `pepbdb` to a CSV file, replacing it atomically.
+    '''
+    tmp_path = f'{manifest_csv}.tmp'
+    with open(tmp_path, 'w', newline='') as file:
+        file.write(f'{ROOT_PREFIX}{os.path.abspath(pepbdb)}\n')
+        writer = csv.DictWriter(file, fieldnames=MANIFEST_COLUMNS)
+        writer.writeheader()
+        writer.writerows(entries)
+    os.replace(tmp_path, manifest_csv)
+
+def read_manifest(manifest_csv: str) -> Tuple[str, List[dict]]:
+    '''
+    Reads the PepBDB root and manifest rows from a CSV file written by `write_manifest`.
+    The root is None for manifests that don't record one.
+    '''
+    root = None
+    with open(manifest_csv, newline='') as file:
+        first_line = file.readline()
+        if first_line.startswith(ROOT_PREFIX):
+            root = first_line[len(ROOT_PREFIX):].rstrip('\r\n')
+        else:
+            file.seek(0)
+        entries = list(csv.DictReader(file))
+    for entry in entries:
+        entry['size'] = int(entry['size'])
+        entry['mtime'] = int(entry['mtime'])
+    return root, entries
+
+def complete_complexes(entries: List[dict]) -> Dict[str, Dict[str, str]]:
+    '''
+    Maps each complex to its file paths, keeping only complexes with every
+    file in `COMPLEX_FILES` present and non-empty.
+    '''
+    complexes = {}
+    for entry in entries:
+        if entry['size'] > 0:
+            complexes.setdefault(entry['complex'], {})[entry['file']] = entry['path']
+    return {name: files for name, files in complexes.items() if all(f in files for f in COMPLEX_FILES)}
+
+def load_or_scan(pepbdb: str, manifest_csv: str, rescan: bool = False, workers: int = None) -> List[dict]:
+    '''
+    Returns the manifest, scanning PepBDB only if it doesn't exist yet, `rescan` is set,
+    or the existing manifest was scanned from a different root than `pepbdb`.
+    '''
+    previous = None
+    if os.path.exists(manifest_csv):
+        root, previous = read_manifest(manifest_csv)
+        if not rescan and root != os.path.abspath(pepbdb):
+            print(f'Manifest {manifest_csv} was scanned from {root}, not {os.path.abspath(pepbdb)}; rescanning...')
+            rescan = True
+        if not rescan:
+            return previous
+
+    entries = scan_pepbdb(pepbdb, previous=previous, workers=workers)
+    write_manifest(entries, manifest_csv, pepbdb)
+    return entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan the PepBDB directory tree and write a manifest of its PDB files.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of threads used to stat and hash files.")
+    add_path_arguments(parser)
+    args = parser.parse_args()
+
+    paths = load_paths(args.config, {key: getattr(args, key) for key in DEFAULTS})
+
+    print(f'Scanning {paths["pepbdb"]}...')
+    entries = load_or_scan(paths['pepbdb'], paths['manifest_csv'], rescan=True, workers=args.workers)
+    complexes = complete_complexes(entries)
+
+    print(f'\033[1mManifest written to {paths["manifest_csv"]}: {len(entries)} files, {len(complexes)} complete complexes.\033[0m')
@@ -1,4 +1,68 @@
-pepbdb = 'path/to/pepbdb/' # dir containing the PDB files
-swissprot = 'path/to/swissprot' # database file
-peppi_data_csv = 'path/to/peppi_data.csv' # output path
-peptide_list_txt = 'path/to/peptidelist.txt' # peptidelist.txt path
\ No newline at end of file
+'''
+    Path configuration for the PepBDB pipeline.
+
+    Paths are resolved in order of precedence: explicit overrides (e.g. CLI
+    arguments), environment variables, an INI config file, then the defaults below.
+    The config file is read from `--config` or the `PEPBDB_CONFIG` environment
+    variable and should contain a `[paths]` section using the keys of `DEFAULTS`.
+'''
+import os
+import configparser
+
+DEFAULTS = {
+    'pepbdb': 'path/to/pepbdb/', # dir containing the PDB files
+    'swissprot': 'path/to/swissprot', # database file
+    'peppi_data_csv': 'path/to/peppi_data.csv', # output path
+    'peptide_list_txt': 'path/to/peptidelist.txt', # peptidelist.txt path
+    'manifest_csv': 'pepbdb_manifest.csv', # manifest written by manifest.py
+    'feature_arrays_pkl': 'list_of_feature_arrays.pkl', # pickled feature arrays
+}
+
+ENV_VARS = {
+    'pepbdb': 'PEPBDB_DIR',
+    'swissprot': 'PEPBDB_SWISSPROT',
+    'peppi_data_csv': 'PEPBDB_PEPPI_DATA_CSV',
+    'peptide_list_txt': 'PEPBDB_PEPTIDE_LIST',
+    'manifest_csv': 'PEPBDB_MANIFEST',
+    'feature_arrays_pkl': 'PEPBDB_FEATURE_ARRAYS_PKL',
+}
+
+CONFIG_ENV_VAR = 'PEPBDB_CONFIG'
+
+def load_paths(config_file: str = None, overrides: dict = None) -> dict:
+    '''
+    Resolves every path in `DEFAULTS` from overrides, environment variables
+    and the config file. `None` overrides are ignored.
+    '''
+    paths = dict(DEFAULTS)
+
+    config_file = config_file or os.environ.get(CONFIG_ENV_VAR)
+    if config_file:
+        if not os.path.exists(config_file):
+            raise FileNotFoundError(f"Config file {config_file} not found.")
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        if config.has_section('paths'):
+            for key in paths:
+                if config.has_option('paths', key):
+                    paths[key] = config.get('paths', key)
+
+    for key, env_var in ENV_VARS.items():
+        if env_var in os.environ:
+            paths[key] = os.environ[env_var]
+
+    for key, value in (overrides or {}).items():
+        if key not in paths:
+            raise KeyError(f"Unknown path option '{key}'.")
+        if value is not None:
+            paths[key] = value
+
+    return paths
+
+def add_path_arguments(parser):
+    '''
+    Adds `--config` and one option per path to an argparse parser.
+    '''
+    parser.add_argument("--config", type=str, help=f"INI file with a [paths] section. Defaults to ${CONFIG_ENV_VAR}.")
+    for key, env_var in ENV_VARS.items():
+        parser.add_argument(f"--{key}", type=str, help=f"Overrides ${env_var} and the config file.")